@@ -1,13 +1,34 @@
-from flask import Flask, render_template, jsonify
+from flask import Flask, render_template, jsonify, request
+from array import array
+import hashlib
 import json
+import math
 import os
-from datetime import datetime
+import struct
+import threading
+import time
+import zlib
+from datetime import datetime, timezone
 
 app = Flask(__name__)
 
 LOG_DIR = "/logs"
 UNIFIED_LOG = f"{LOG_DIR}/unified.log"
 ACTIONS_LOG = f"{LOG_DIR}/actions.log"
+ROLLUP_FILE = f"{LOG_DIR}/rollups.bin"
+
+# Rollup tiers: (name, seconds per slot, slots kept)
+ROLLUP_TIERS = [
+    ("minute", 60, 1440),       # 24 hours
+    ("hour", 3600, 24 * 90),    # 90 days
+    ("day", 86400, 730),        # 2 years
+]
+MAX_METRICS = 256             # new metric names beyond this are dropped
+MAX_POINTS = 500              # cap on points returned by /api/timeseries
+HLL_PRECISION = 8             # 256 registers per slot, ~6.5% error on unique IPs
+PERSIST_INTERVAL = 60         # seconds between rollup snapshots
+MAX_FUTURE_SKEW = 300         # records dated further ahead of the clock are dropped
+UNIQUE_METRIC = "attackers.unique"
 
 def read_log_file(filepath, max_lines=50):
     """Read last N lines from log file"""
@@ -22,6 +43,265 @@ def read_log_file(filepath, max_lines=50):
         print(f"Error reading {filepath}: {e}")
         return []
 
+def alert_severity(alert_type):
+    if 'Brute' in alert_type:
+        return 'high'
+    elif 'Credential' in alert_type:
+        return 'critical'
+    return 'medium'
+
+def parse_time(value, default=None):
+    """Unix seconds from an epoch number or ISO 8601 string (naive = UTC)"""
+    if value in (None, ''):
+        return default
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        pass
+    try:
+        dt = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=timezone.utc)
+        return dt.timestamp()
+    except ValueError:
+        return default
+
+
+class HyperLogLog:
+    """Approximate distinct counting over a bytearray of registers"""
+
+    SIZE = 1 << HLL_PRECISION
+
+    @classmethod
+    def add(cls, registers, offset, value):
+        h = int.from_bytes(hashlib.blake2b(str(value).encode(), digest_size=8).digest(), 'big')
+        bits = 64 - HLL_PRECISION
+        index = offset + (h >> bits)
+        rank = bits - (h & ((1 << bits) - 1)).bit_length() + 1
+        if rank > registers[index]:
+            registers[index] = rank
+
+    @classmethod
+    def estimate(cls, registers):
+        m = len(registers)
+        zeros = registers.count(0)
+        if zeros == m:
+            return 0
+        raw = 0.7213 / (1 + 1.079 / m) * m * m / sum(2.0 ** -r for r in registers)
+        if raw <= 2.5 * m and zeros:
+            raw = m * math.log(m / zeros)
+        return round(raw)
+
+
+class RollupTier:
+    """Fixed-size ring buffer of time slots, one counter array per metric"""
+
+    def __init__(self, name, step, slots):
+        self.name = name
+        self.step = step
+        self.slots = slots
+        self.epochs = array('q', [-1]) * slots
+        self.counters = {}
+        self.unique = bytearray(slots * HyperLogLog.SIZE)
+
+    def _slot(self, ts):
+        """Slot for a timestamp, resetting it if it held an older period"""
+        period = int(ts // self.step)
+        slot = period % self.slots
+        if self.epochs[slot] != period:
+            if self.epochs[slot] > period:
+                return None  # older than the ring keeps
+            for counts in self.counters.values():
+                counts[slot] = 0
+            start = slot * HyperLogLog.SIZE
+            self.unique[start:start + HyperLogLog.SIZE] = bytes(HyperLogLog.SIZE)
+            self.epochs[slot] = period
+        return slot
+
+    def add(self, metric, ts, count=1):
+        slot = self._slot(ts)
+        if slot is None:
+            return
+        counts = self.counters.get(metric)
+        if counts is None:
+            if len(self.counters) >= MAX_METRICS:
+                return
+            counts = self.counters[metric] = array('I', [0]) * self.slots
+        counts[slot] += count
+
+    def add_unique(self, ts, value):
+        slot = self._slot(ts)
+        if slot is not None:
+            HyperLogLog.add(self.unique, slot * HyperLogLog.SIZE, value)
+
+    def covers(self, ts, now):
+        return int(ts // self.step) > int(now // self.step) - self.slots
+
+    def oldest(self, now):
+        """Start of the oldest slot the ring can still hold"""
+        return (int(now // self.step) - self.slots + 1) * self.step
+
+    def series(self, metric, start, end, step):
+        """Points of `step` seconds (a multiple of self.step) between start and end"""
+        per_point = step // self.step
+        first = int(start // step) * per_point
+        last = int(end // self.step)
+        counts = self.counters.get(metric)
+        points = []
+        for point_start in range(first, last + 1, per_point):
+            periods = range(point_start, min(point_start + per_point, last + 1))
+            live = [p % self.slots for p in periods if self.epochs[p % self.slots] == p]
+            if metric == UNIQUE_METRIC:
+                merged = bytearray(HyperLogLog.SIZE)
+                for slot in live:
+                    start_byte = slot * HyperLogLog.SIZE
+                    merged = bytearray(map(max, merged, self.unique[start_byte:start_byte + HyperLogLog.SIZE]))
+                value = HyperLogLog.estimate(merged)
+            else:
+                value = sum(counts[slot] for slot in live) if counts else 0
+            points.append([point_start * self.step, value])
+        return points
+
+
+class Rollups:
+    """Per-minute/hour/day counters fed incrementally from the log files"""
+
+    def __init__(self):
+        self.tiers = [RollupTier(*tier) for tier in ROLLUP_TIERS]
+        self.offsets = {UNIFIED_LOG: 0, ACTIONS_LOG: 0}
+        self.lock = threading.Lock()
+        self.last_persist = 0
+
+    def add(self, metric, ts):
+        for tier in self.tiers:
+            tier.add(metric, ts)
+
+    def add_unique(self, ts, value):
+        for tier in self.tiers:
+            tier.add_unique(ts, value)
+
+    def ingest(self, record, filepath):
+        now = time.time()
+        ts = parse_time(record.get('timestamp'), now)
+        # A future-dated record would claim (and wipe) a live slot until its period comes
+        if not math.isfinite(ts) or ts > now + MAX_FUTURE_SKEW:
+            return
+        if filepath == ACTIONS_LOG:
+            self.add(f"actions.{record.get('status', 'unknown')}", ts)
+        elif record.get('alert_type') or record.get('source') == 'detection-alert':
+            alert_type = record.get('alert_type', 'Unknown')
+            self.add(f"alerts.{alert_type}", ts)
+            self.add(f"alerts.severity.{alert_severity(alert_type)}", ts)
+            if record.get('ip'):
+                self.add_unique(ts, record['ip'])
+        else:
+            self.add(f"events.{record.get('event', 'unknown')}", ts)
+
+    def refresh(self):
+        """Fold lines appended since the last call into the rollups"""
+        with self.lock:
+            for filepath, offset in self.offsets.items():
+                try:
+                    if not os.path.exists(filepath):
+                        continue
+                    if os.path.getsize(filepath) < offset:
+                        offset = 0  # truncated or rotated
+                    with open(filepath, 'rb') as f:
+                        f.seek(offset)
+                        for line in f:
+                            if not line.endswith(b'\n'):
+                                break  # partial write, pick it up next time
+                            offset += len(line)
+                            try:
+                                record = json.loads(line)
+                                if isinstance(record, dict):
+                                    self.ingest(record, filepath)
+                            except Exception:
+                                continue
+                except Exception as e:
+                    print(f"Error rolling up {filepath}: {e}")
+                finally:
+                    # Lines already counted are never counted again
+                    self.offsets[filepath] = offset
+            if time.time() - self.last_persist >= PERSIST_INTERVAL:
+                self.save()
+
+    def metrics(self):
+        names = set()
+        with self.lock:
+            for tier in self.tiers:
+                names.update(tier.counters)
+        return sorted(names | {UNIQUE_METRIC})
+
+    def series(self, metric, start, end, step=None):
+        now = time.time()
+        end = min(end, now)
+        # Nothing older than the coarsest ring is kept, don't walk those periods
+        start = max(start, self.tiers[-1].oldest(now))
+        step = max(step or 0, (end - start) / MAX_POINTS)
+        # Coarsest tier that still holds `start` and is no coarser than `step`
+        covering = [t for t in self.tiers if t.covers(start, now)] or self.tiers[-1:]
+        fitting = [t for t in covering if t.step <= step]
+        tier = fitting[-1] if fitting else covering[0]
+        step = max(1, math.ceil(step / tier.step)) * tier.step
+        # Work is O(min(range, tier.slots)) whatever range was asked for
+        start = max(start, tier.oldest(now))
+        if start > end:
+            return tier.name, step, []
+        with self.lock:
+            return tier.name, step, tier.series(metric, start, end, step)
+
+    def save(self):
+        """Write all tiers to ROLLUP_FILE: zlib(header length, JSON header, raw arrays)"""
+        header = {"offsets": self.offsets, "tiers": []}
+        blobs = []
+        for tier in self.tiers:
+            metrics = sorted(tier.counters)
+            header["tiers"].append({"name": tier.name, "step": tier.step, "slots": tier.slots, "metrics": metrics})
+            blobs.append(tier.epochs.tobytes())
+            blobs.extend(tier.counters[m].tobytes() for m in metrics)
+            blobs.append(bytes(tier.unique))
+        head = json.dumps(header).encode()
+        try:
+            tmp = f"{ROLLUP_FILE}.tmp"
+            with open(tmp, 'wb') as f:
+                f.write(zlib.compress(struct.pack('>I', len(head)) + head + b''.join(blobs)))
+            os.replace(tmp, ROLLUP_FILE)
+            self.last_persist = time.time()
+        except Exception as e:
+            print(f"Error saving rollups: {e}")
+
+    def load(self):
+        try:
+            if not os.path.exists(ROLLUP_FILE):
+                return
+            with open(ROLLUP_FILE, 'rb') as f:
+                data = zlib.decompress(f.read())
+            size = struct.unpack('>I', data[:4])[0]
+            header = json.loads(data[4:4 + size])
+            if [(t["name"], t["step"], t["slots"]) for t in header["tiers"]] != [t[:3] for t in ROLLUP_TIERS]:
+                print("Rollup tiers changed, rebuilding from logs")
+                return
+            pos = 4 + size
+            for tier, meta in zip(self.tiers, header["tiers"]):
+                width = tier.slots * 8
+                tier.epochs = array('q', data[pos:pos + width])
+                pos += width
+                for metric in meta["metrics"]:
+                    width = tier.slots * 4
+                    tier.counters[metric] = array('I', data[pos:pos + width])
+                    pos += width
+                width = tier.slots * HyperLogLog.SIZE
+                tier.unique = bytearray(data[pos:pos + width])
+                pos += width
+            self.offsets.update(header["offsets"])
+        except Exception as e:
+            print(f"Error loading rollups, rebuilding from logs: {e}")
+            self.__init__()
+
+rollups = Rollups()
+rollups.load()
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -30,6 +310,8 @@ def index():
 def dashboard_data():
     """Provide data for dashboard"""
     
+    rollups.refresh()
+    
     # Read logs
     unified_logs = read_log_file(UNIFIED_LOG)
     action_logs = read_log_file(ACTIONS_LOG)
@@ -52,12 +334,7 @@ def dashboard_data():
             
                 # Determine severity based on alert type and confidence
                 confidence = log.get('confidence', 0)
-                if 'Brute' in alert_type:
-                    severity = 'high'
-                elif 'Credential' in alert_type:
-                    severity = 'critical'
-                else:
-                    severity = 'medium'
+                severity = alert_severity(alert_type)
             
                 incidents.append({
                     'type': alert_type.replace('_', ' ').title(),
@@ -131,6 +408,34 @@ def dashboard_data():
         'actions': actions[-10:]
      })
 
+@app.route('/api/timeseries')
+def timeseries():
+    """Downsampled history for one metric from the rollup tiers"""
+    rollups.refresh()
+
+    metric = request.args.get('metric')
+    if metric not in rollups.metrics():
+        return jsonify({'error': f"Unknown metric: {metric}", 'metrics': rollups.metrics()}), 400
+
+    now = time.time()
+    end = parse_time(request.args.get('to'), now)
+    start = parse_time(request.args.get('from'), end - 3600)
+    step = parse_time(request.args.get('step'))
+    if any(value is not None and not math.isfinite(value) for value in (start, end, step)):
+        return jsonify({'error': 'Invalid from/to/step'}), 400
+    if start is None or end is None or start >= end or (step is not None and step <= 0):
+        return jsonify({'error': 'Invalid from/to/step'}), 400
+
+    tier, step, points = rollups.series(metric, start, end, step)
+    return jsonify({
+        'metric': metric,
+        'tier': tier,
+        'step': step,
+        'from': start,
+        'to': end,
+        'points': points
+    })
+
 if __name__ == '__main__':
     print("📊 Dashboard starting on port 80...")
     app.run(host='0.0.0.0', port=80)
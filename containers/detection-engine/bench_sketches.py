@@ -0,0 +1,113 @@
+"""Memory benchmark for the sketch-based failure detection.
+
+Feeds synthetic failed logins (random IPs x random users, event time
+advancing so the window slides) through detect_failure_patterns() and
+prints sketch memory and peak RSS at every checkpoint. Both should level
+off, no matter how many events follow. Halfway through, one IP sprays
+--attempts distinct users and one user is tried from --attempts distinct
+IPs; the run reports whether each attack was detected.
+
+    python bench_sketches.py --events 10000000
+    python bench_sketches.py --accuracy   # HyperLogLog error by cardinality
+"""
+from datetime import datetime, timedelta, timezone
+import argparse
+import math
+import random
+import resource
+import time
+
+import detector
+
+
+def reference_estimate(registers):
+    """Textbook HyperLogLog estimate (raw, with linear counting below 2.5m)"""
+    m = len(registers)
+    alpha = 0.7213 / (1 + 1.079 / m) if m >= 128 else {16: 0.673, 32: 0.697, 64: 0.709}[m]
+    raw = alpha * m * m / sum(2.0 ** -r for r in registers)
+    zeros = registers.count(0)
+    if raw <= 2.5 * m and zeros:
+        return m * math.log(m / zeros)
+    return raw
+
+def accuracy(trials=200):
+    """Compare detector.HyperLogLog.estimate with the textbook formula"""
+    print(f"{'distinct':>9} {'mean rel err':>13} {'max rel err':>12} {'differs from ref':>17}")
+    for n in (1, 5, 10, 20, 50, 100, 250, 1000, 10000):
+        errors, differs = [], 0
+        for trial in range(trials):
+            hll = detector.HyperLogLog()
+            for i in range(n):
+                hll.add(f"{trial}:{i}")
+            estimate = hll.count()
+            differs += abs(estimate - reference_estimate(hll.registers)) > 1e-9
+            errors.append(abs(estimate - n) / n)
+        print(f"{n:>9} {sum(errors) / trials:>13.3f} {max(errors):>12.3f} {differs:>17}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--events', type=int, default=10_000_000)
+    parser.add_argument('--ips', type=int, default=1_000_000, help='distinct source IPs')
+    parser.add_argument('--users', type=int, default=100_000, help='distinct usernames')
+    parser.add_argument('--rate', type=float, default=1000.0, help='events per second of event time')
+    parser.add_argument('--checkpoints', type=int, default=10)
+    parser.add_argument('--attempts', type=int, default=29, help='attempts per injected attack')
+    parser.add_argument('--attack-interval', type=float, default=8.0, help='seconds between attack attempts')
+    parser.add_argument('--accuracy', action='store_true', help='only check HyperLogLog accuracy')
+    args = parser.parse_args()
+    if args.accuracy:
+        return accuracy()
+
+    rng = random.Random(42)
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    step = timedelta(seconds=1 / args.rate)
+    every = max(1, args.events // args.checkpoints)
+
+    # One spraying IP and one distributed target, injected mid-run among the noise
+    spray_ip, victim = "6.6.6.6", "victim"
+    interval = max(2, int(args.attack_interval * args.rate))
+    attack_start = args.events // 2
+    attacks = {}
+    for k in range(args.attempts):
+        attacks[attack_start + k * interval] = (spray_ip, f"user{rng.randrange(args.users)}")
+        attacks[attack_start + k * interval + interval // 2] = (f"172.16.{k // 256}.{k % 256}", victim)
+    detected = {'spray': None, 'distributed': None}
+    other_alerts = {}
+    attempts = {'spray': 0, 'distributed': 0}
+
+    print(f"{'events':>12} {'ips':>7} {'users':>7} {'sketch KiB':>11} {'peak RSS MiB':>13} {'events/s':>10}")
+    began = time.perf_counter()
+    for n in range(1, args.events + 1):
+        if n in attacks:
+            ip, user = attacks[n]
+            attempts['spray' if ip == spray_ip else 'distributed'] += 1
+        else:
+            i = rng.randrange(args.ips)
+            ip = f"10.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}"
+            user = f"user{rng.randrange(args.users)}"
+        for alert in detector.detect_failure_patterns(ip, user, start + step * n):
+            if alert['alert_type'] == 'PasswordSprayingSuspected' and alert['ip'] == spray_ip:
+                detected['spray'] = detected['spray'] or attempts['spray']
+            elif alert['alert_type'] == 'DistributedBruteForceSuspected' and alert['user'] == victim:
+                detected['distributed'] = detected['distributed'] or attempts['distributed']
+            else:
+                other_alerts[alert['alert_type']] = other_alerts.get(alert['alert_type'], 0) + 1
+
+        if n % every == 0:
+            elapsed = time.perf_counter() - began
+            peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+            print(f"{n:>12} {len(detector.users_per_ip):>7} {len(detector.ips_per_user):>7} "
+                  f"{detector.sketch_memory_bytes() / 1024:>11.0f} {peak_rss:>13.1f} {n / elapsed:>10.0f}")
+
+    print(f"evicted keys: {detector.users_per_ip.evicted + detector.ips_per_user.evicted}, "
+          f"other alerts: {other_alerts or 0}")
+    for name, threshold in (('spray', detector.SPRAY_USER_THRESHOLD),
+                            ('distributed', detector.DISTRIBUTED_IP_THRESHOLD)):
+        if detected[name]:
+            print(f"{name}: detected after {detected[name]} of {attempts[name]} attempts (threshold {threshold})")
+        else:
+            print(f"{name}: NOT detected in {attempts[name]} attempts (threshold {threshold})")
+
+
+if __name__ == '__main__':
+    main()
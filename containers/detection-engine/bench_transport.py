@@ -0,0 +1,135 @@
+"""Transport benchmark: shared-memory event ring vs HTTP /analyze.
+
+Runs the detection engine in a child process twice, once behind its Flask
+app on localhost (the collector's requests.post path) and once consuming
+the event ring (the collector's EventRingWriter path), and pushes the
+same synthetic events through each. Latency is measured from just before
+the collector-side send to the end of process_event(); alert delivery to
+/logs and n8n is stubbed out so only the transport is compared.
+
+"burst" sends as fast as the producer can (throughput, latency includes
+queueing); "paced" sends --rate events/s (latency of an idle pipeline).
+
+    python bench_transport.py --events 20000 --rate 200
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'log-collector'))
+import collector  # noqa: E402
+
+
+def run_detector(mode, ring_path, port, events, conn):
+    """Child process: detection engine fed over `mode`, reports latencies (ns)"""
+    import logging
+    from werkzeug.serving import make_server
+    import detector
+
+    detector.VERBOSE = False
+    detector.save_alert = detector.send_to_n8n = lambda alert: None
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+
+    latencies = []
+    done = threading.Event()
+    process_event = detector.process_event
+
+    def timed_process_event(log, now=None, keys=('ip', 'user')):
+        alerts = process_event(log, now, keys)
+        latencies.append(time.monotonic_ns() - log['details']['sent_ns'])
+        if len(latencies) == events:
+            done.set()
+        return alerts
+
+    detector.process_event = timed_process_event
+    threading.Thread(target=detector.dispatch_alerts, daemon=True).start()
+    if mode == 'ring':
+        detector.EVENT_RING_PATH = ring_path
+        threading.Thread(target=detector.consume_ring, daemon=True).start()
+    else:
+        server = make_server('127.0.0.1', port, detector.app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    conn.send('ready')
+    done.wait()
+    conn.send(latencies)
+    conn.recv()  # keep serving the last response until the parent is done
+
+def make_events(count):
+    rng = random.Random(7)
+    return [{
+        "timestamp": f"2026-01-01T00:{i // 60000 % 60:02d}:{i // 1000 % 60:02d}.{i % 1000:03d}+00:00",
+        "source": "bench",
+        "event": rng.choice(['login_failed', 'login_success']),
+        "user": f"user{rng.randrange(10000)}",
+        "ip": f"10.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(256)}",
+        "details": {}
+    } for i in range(count)]
+
+def run(mode, load, events, ring_path, port, rate=None):
+    ctx = multiprocessing.get_context('spawn')
+    parent, child = ctx.Pipe()
+    writer = collector.EventRingWriter(ring_path, collector.EVENT_RING_SIZE) if mode == 'ring' else None
+    proc = ctx.Process(target=run_detector, args=(mode, ring_path, port, len(events), child), daemon=True)
+    proc.start()
+    parent.recv()
+
+    url = f'http://127.0.0.1:{port}/analyze'
+    if mode == 'ring':
+        while not writer.consumer_alive():
+            time.sleep(0.01)
+    else:
+        while True:
+            try:
+                requests.get(f'http://127.0.0.1:{port}/health', timeout=1)
+                break
+            except requests.ConnectionError:
+                time.sleep(0.05)
+
+    full = 0
+    started = time.perf_counter()
+    for event in events:
+        event['details']['sent_ns'] = time.monotonic_ns()
+        if mode == 'ring':
+            payload = json.dumps(event).encode()
+            while not writer.publish(payload):
+                full += 1
+                time.sleep(0)
+        else:
+            requests.post(url, json=event, timeout=2)
+        if rate:
+            time.sleep(1 / rate)
+    latencies = sorted(parent.recv())
+    elapsed = time.perf_counter() - started
+    proc.terminate()
+
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] / 1000
+    print(f"{mode:>5} {load:>6} {len(events) / elapsed:>11.0f} {pct(0.5):>9.1f} {pct(0.99):>9.1f} {full:>10}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--events', type=int, default=20000)
+    parser.add_argument('--paced-events', type=int, default=1000)
+    parser.add_argument('--rate', type=float, default=200.0, help='events/s for the paced run')
+    parser.add_argument('--port', type=int, default=15001)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'path':>5} {'load':>6} {'events/s':>11} {'p50 us':>9} {'p99 us':>9} {'ring full':>10}")
+        ring_path = os.path.join(tmp, 'events.ring')
+        run('http', 'burst', make_events(args.events), None, args.port)
+        run('ring', 'burst', make_events(args.events), ring_path, args.port)
+        run('http', 'paced', make_events(args.paced_events), None, args.port, args.rate)
+        run('ring', 'paced', make_events(args.paced_events), ring_path, args.port, args.rate)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,17 @@
 from flask import Flask, request, jsonify, Response
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
 from datetime import datetime, timedelta, timezone
+from array import array
+import hashlib
+import math
 import json
+import mmap
 import requests
 import os
+import queue
+import struct
+import threading
+import time
 
 app = Flask(__name__)
 
@@ -11,21 +19,387 @@ app = Flask(__name__)
 failed_logins = defaultdict(list)
 successful_logins = {}
 privilege_events = []
+last_sweep = None
 
 # Detection thresholds
 BRUTE_FORCE_THRESHOLD = 3
 TIME_WINDOW = timedelta(minutes=5)
 
-def clean_old_data():
-    cutoff = datetime.now(timezone.utc) - TIME_WINDOW
-    
-    for ip in list(failed_logins.keys()):
-        failed_logins[ip] = [
-            t for t in failed_logins[ip] 
-            if (t.replace(tzinfo=timezone.utc) if t.tzinfo is None else t) > cutoff
+# Per-event detection logging (replay turns it off)
+VERBOSE = True
+
+# Events from HTTP handlers and the ring consumer share the state above
+detection_lock = threading.Lock()
+
+# Alerts are written to /logs and sent to n8n by a dispatcher thread, so a
+# slow n8n never stalls detection. A full queue blocks detection (backpressure).
+ALERT_QUEUE_SIZE = int(os.environ.get('ALERT_QUEUE_SIZE', '10000'))
+alert_queue = queue.Queue(ALERT_QUEUE_SIZE)
+
+# Optional shared-memory transport from a co-located log collector
+EVENT_RING_PATH = os.environ.get('EVENT_RING_PATH')
+RING_BATCH = int(os.environ.get('RING_BATCH', '256'))
+RING_POLL_INTERVAL = 0.001
+RING_MAGIC = b'SOCRING1'
+RING_HEADER = 128
+RING_WRAP = 0xFFFFFFFF
+RECORD_HEADER = struct.Struct('<IQ')  # payload length, sequence number
+RING_CHECK_INTERVAL = 1.0  # seconds between checks that the ring file was not replaced
+event_ring = None
+ring_stats = {"received": 0, "lost": 0, "resets": 0}
+
+# Sketch-based detection (password spraying / distributed brute force).
+# Memory is fixed by these settings, not by the number of IPs x users seen.
+SPRAY_USER_THRESHOLD = int(os.environ.get('SPRAY_USER_THRESHOLD', '10'))
+DISTRIBUTED_IP_THRESHOLD = int(os.environ.get('DISTRIBUTED_IP_THRESHOLD', '10'))
+HEAVY_HITTER_THRESHOLD = int(os.environ.get('HEAVY_HITTER_THRESHOLD', '50'))
+HLL_ERROR_RATE = float(os.environ.get('HLL_ERROR_RATE', '0.08'))  # relative std error
+CMS_EPSILON = float(os.environ.get('CMS_EPSILON', '0.00003'))  # overcount <= epsilon * total
+CMS_DELTA = float(os.environ.get('CMS_DELTA', '0.01'))  # probability bound is exceeded
+SKETCH_MAX_KEYS = int(os.environ.get('SKETCH_MAX_KEYS', '20000'))  # per table, LRU evicted
+SKETCH_ADMISSION = int(os.environ.get('SKETCH_ADMISSION', '3'))  # failures before a key gets an HLL
+SKETCH_BUCKETS = int(os.environ.get('SKETCH_BUCKETS', '5'))  # sub-windows per TIME_WINDOW
+
+
+def hash64(value):
+    """Stable 64-bit hash (Python's hash() is salted per process)"""
+    return int.from_bytes(
+        hashlib.blake2b(str(value).encode(), digest_size=8).digest(), 'big'
+    )
+
+def time_bucket(timestamp):
+    """Index of the sub-window a timestamp falls into"""
+    width = TIME_WINDOW.total_seconds() / SKETCH_BUCKETS
+    return int(timestamp.timestamp() // width)
+
+def sketch_epoch(timestamp, now=None):
+    """Sub-window for a sketch update, never later than `now`.
+
+    Timestamps come from the client; one dated far in the future would
+    otherwise move every sketch's window there and stop it from rotating.
+    """
+    if now is not None:
+        timestamp = min(timestamp, now)
+    return time_bucket(timestamp)
+
+
+INVERSE_POWERS = [2.0 ** -r for r in range(65)]
+
+
+class HyperLogLog:
+    """Distinct counter with fixed memory (2^precision one-byte registers)"""
+
+    def __init__(self, error_rate=None):
+        error_rate = error_rate or HLL_ERROR_RATE
+        self.precision = min(16, max(4, math.ceil(math.log2((1.04 / error_rate) ** 2))))
+        self.size = 1 << self.precision
+        self.registers = bytearray(self.size)
+
+    def add_hash(self, h):
+        """Add a 64-bit hash, return True if a register changed"""
+        bits = 64 - self.precision
+        index = h >> bits
+        rank = bits - (h & ((1 << bits) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+            return True
+        return False
+
+    def add(self, value):
+        return self.add_hash(hash64(value))
+
+    def count(self):
+        return self.estimate(self.registers)
+
+    def estimate(self, registers):
+        m = len(registers)
+        zeros = registers.count(0)
+        # Small range: linear counting, and the raw estimate is surely <= 2.5m
+        if zeros >= m / math.e:
+            return m * math.log(m / zeros)
+        if m >= 128:
+            alpha = 0.7213 / (1 + 1.079 / m)
+        else:
+            alpha = {16: 0.673, 32: 0.697, 64: 0.709}[m]
+        raw = alpha * m * m / sum(map(INVERSE_POWERS.__getitem__, registers))
+        if raw <= 2.5 * m and zeros:
+            return m * math.log(m / zeros)
+        return raw
+
+    def clear(self):
+        self.registers[:] = bytes(self.size)
+
+    def memory_bytes(self):
+        return self.size
+
+
+class SlidingHyperLogLog:
+    """HyperLogLog over TIME_WINDOW, split into SKETCH_BUCKETS rotating sub-windows.
+
+    `merged` is the register-wise max of the live sub-windows. It is kept
+    up to date on every add and only rebuilt when the window rotates.
+    """
+
+    __slots__ = ('buckets', 'epochs', 'last_epoch', 'merged', 'value')
+
+    def __init__(self):
+        self.buckets = [None] * SKETCH_BUCKETS
+        self.epochs = [None] * SKETCH_BUCKETS
+        self.last_epoch = None
+        self.merged = None
+        self.value = 0.0
+
+    def add_hash(self, h, epoch):
+        """Add a hash in the given sub-window, return the (cached) window estimate"""
+        rotated = self.last_epoch is None or epoch > self.last_epoch
+        if rotated:
+            self.last_epoch = epoch
+        # Late events older than the window land in the oldest live sub-window
+        epoch = max(epoch, self.last_epoch - SKETCH_BUCKETS + 1)
+        slot = epoch % SKETCH_BUCKETS
+        if self.epochs[slot] != epoch:
+            if self.buckets[slot] is None:
+                self.buckets[slot] = HyperLogLog()
+            else:
+                self.buckets[slot].clear()
+            self.epochs[slot] = epoch
+        bucket = self.buckets[slot]
+        if rotated:
+            self.merged = self.merge(self.last_epoch)
+        changed = rotated
+        if bucket.add_hash(h):
+            index = h >> (64 - bucket.precision)
+            if bucket.registers[index] > self.merged[index]:
+                self.merged[index] = bucket.registers[index]
+                changed = True
+        if changed:
+            self.value = bucket.estimate(self.merged)
+        return self.value
+
+    def merge(self, epoch):
+        """Register-wise max of the sub-windows live at `epoch`"""
+        live = [
+            b for b, e in zip(self.buckets, self.epochs)
+            if e is not None and epoch - SKETCH_BUCKETS < e <= epoch
+        ]
+        if len(live) == 1:
+            return bytearray(live[0].registers)
+        return bytearray(map(max, *(b.registers for b in live)))
+
+    def memory_bytes(self):
+        merged = len(self.merged) if self.merged is not None else 0
+        return merged + sum(b.memory_bytes() for b in self.buckets if b is not None)
+
+
+class KeyedSlidingHyperLogLog:
+    """One SlidingHyperLogLog per key, capped at max_keys (least recently seen evicted)"""
+
+    def __init__(self, max_keys=None):
+        self.max_keys = max_keys or SKETCH_MAX_KEYS
+        self.sketches = OrderedDict()
+        self.evicted = 0
+
+    def add(self, key, h, epoch):
+        sketch = self.sketches.get(key)
+        if sketch is None:
+            sketch = self.sketches[key] = SlidingHyperLogLog()
+        else:
+            self.sketches.move_to_end(key)
+        value = sketch.add_hash(h, epoch)
+        self.expire(epoch)
+        return value
+
+    def expire(self, epoch):
+        while self.sketches:
+            key, oldest = next(iter(self.sketches.items()))
+            if len(self.sketches) > self.max_keys:
+                self.evicted += 1
+            elif oldest.last_epoch > epoch - SKETCH_BUCKETS:
+                break
+            del self.sketches[key]
+
+    def __len__(self):
+        return len(self.sketches)
+
+    def memory_bytes(self):
+        return sum(s.memory_bytes() for s in self.sketches.values())
+
+
+class SlidingCountMinSketch:
+    """Count-min sketch over TIME_WINDOW with rotating sub-window tables.
+
+    Uses conservative update: only the rows at the current minimum are
+    raised, which keeps collisions from inflating small counts.
+    """
+
+    def __init__(self, epsilon=None, delta=None):
+        self.width = math.ceil(math.e / (epsilon or CMS_EPSILON))
+        self.depth = math.ceil(math.log(1 / (delta or CMS_DELTA)))
+        self.tables = [array('I', bytes(4 * self.width * self.depth)) for _ in range(SKETCH_BUCKETS)]
+        self.epochs = [None] * SKETCH_BUCKETS
+        self.last_epoch = None
+
+    def _indexes(self, h):
+        h1, h2 = h & 0xFFFFFFFF, (h >> 32) | 1
+        return [row * self.width + (h1 + row * h2) % self.width for row in range(self.depth)]
+
+    def add_hash(self, h, epoch, count=1):
+        """Count a hash in the given sub-window, return its (before, after) window estimates"""
+        if self.last_epoch is None or epoch > self.last_epoch:
+            self.last_epoch = epoch
+        epoch = max(epoch, self.last_epoch - SKETCH_BUCKETS + 1)
+        slot = epoch % SKETCH_BUCKETS
+        if self.epochs[slot] != epoch:
+            self.tables[slot] = array('I', bytes(4 * self.width * self.depth))
+            self.epochs[slot] = epoch
+        indexes = self._indexes(h)
+        sums = self.window_sums(indexes, self.last_epoch)
+        before = min(sums)
+        table = self.tables[slot]
+        for i, total in zip(indexes, sums):
+            if total < before + count:
+                table[i] += before + count - total
+        return before, before + count
+
+    def estimate(self, h, epoch):
+        return min(self.window_sums(self._indexes(h), epoch))
+
+    def window_sums(self, indexes, epoch):
+        live = [
+            t for t, e in zip(self.tables, self.epochs)
+            if e is not None and epoch - SKETCH_BUCKETS < e <= epoch
         ]
-        if not failed_logins[ip]:
-            del failed_logins[ip]
+        return [sum(t[i] for t in live) for i in indexes]
+
+    def memory_bytes(self):
+        return sum(t.itemsize * len(t) for t in self.tables)
+
+
+users_per_ip = KeyedSlidingHyperLogLog()
+ips_per_user = KeyedSlidingHyperLogLog()
+failure_counts = SlidingCountMinSketch()
+
+def detect_heavy_hitter(entity, value, ip, user, timestamp, epoch):
+    """Count one failure for `value`; return (failed_count, alerts)"""
+    before, failed_count = failure_counts.add_hash(hash64(f"{entity}:{value}"), epoch)
+    if before < HEAVY_HITTER_THRESHOLD <= failed_count:
+        return failed_count, [{
+            "alert_id": f"HFR-{value}-{int(timestamp.timestamp())}",
+            "alert_type": "HighFailureRate",
+            "confidence": 0.75,
+            "entity": entity,
+            "ip": ip or "unknown",
+            "user": user or "unknown",
+            "failed_count": failed_count,
+            "timestamp": timestamp.isoformat(),
+            "source": "detection-alert"
+        }]
+    return failed_count, []
+
+def detect_ip_patterns(ip, user, timestamp, now=None):
+    """IP-keyed sketch rules: heavy hitter per IP and password spraying.
+
+    A key only gets a distinct-count HLL once its count-min failure count
+    reaches SKETCH_ADMISSION, so one-off noise never enters the LRU tables.
+    The admission failures themselves are not in the HLL, so an alert can
+    fire up to SKETCH_ADMISSION - 1 attempts late.
+    """
+    if not ip:
+        return []
+    epoch = sketch_epoch(timestamp, now)
+    failed_count, alerts = detect_heavy_hitter('ip', ip, ip, user, timestamp, epoch)
+
+    # Password spraying: one IP, many distinct users
+    if user and (failed_count >= SKETCH_ADMISSION or ip in users_per_ip.sketches):
+        before = users_per_ip.sketches[ip].value if ip in users_per_ip.sketches else 0.0
+        distinct_users = users_per_ip.add(ip, hash64(user), epoch)
+        if before < SPRAY_USER_THRESHOLD <= distinct_users:
+            alerts.append({
+                "alert_id": f"SPRAY-{ip}-{int(timestamp.timestamp())}",
+                "alert_type": "PasswordSprayingSuspected",
+                "confidence": 0.80,
+                "ip": ip,
+                "user": "multiple",
+                "distinct_users": round(distinct_users),
+                "timestamp": timestamp.isoformat(),
+                "source": "detection-alert"
+            })
+    return alerts
+
+def detect_user_patterns(ip, user, timestamp, now=None):
+    """User-keyed sketch rules: heavy hitter per user and distributed brute force.
+
+    Same admission as detect_ip_patterns(), keyed by user.
+    """
+    if not user:
+        return []
+    epoch = sketch_epoch(timestamp, now)
+    failed_count, alerts = detect_heavy_hitter('user', user, ip, user, timestamp, epoch)
+
+    # Distributed brute force: one user, many distinct IPs
+    if ip and (failed_count >= SKETCH_ADMISSION or user in ips_per_user.sketches):
+        before = ips_per_user.sketches[user].value if user in ips_per_user.sketches else 0.0
+        distinct_ips = ips_per_user.add(user, hash64(ip), epoch)
+        if before < DISTRIBUTED_IP_THRESHOLD <= distinct_ips:
+            alerts.append({
+                "alert_id": f"DBF-{user}-{int(timestamp.timestamp())}",
+                "alert_type": "DistributedBruteForceSuspected",
+                "confidence": 0.80,
+                "ip": ip,
+                "user": user,
+                "distinct_ips": round(distinct_ips),
+                "timestamp": timestamp.isoformat(),
+                "source": "detection-alert"
+            })
+    return alerts
+
+def detect_failure_patterns(ip, user, timestamp, now=None):
+    """Update failure sketches, return spraying / distributed / heavy-hitter alerts"""
+    return detect_ip_patterns(ip, user, timestamp, now) + detect_user_patterns(ip, user, timestamp, now)
+
+def sketch_memory_bytes():
+    return users_per_ip.memory_bytes() + ips_per_user.memory_bytes() + failure_counts.memory_bytes()
+
+def trace(message):
+    if VERBOSE:
+        print(message)
+
+def reset_state():
+    """Drop all detection state (replay starts each run from scratch)"""
+    global users_per_ip, ips_per_user, failure_counts, last_sweep
+    failed_logins.clear()
+    successful_logins.clear()
+    privilege_events.clear()
+    last_sweep = None
+    users_per_ip = KeyedSlidingHyperLogLog()
+    ips_per_user = KeyedSlidingHyperLogLog()
+    failure_counts = SlidingCountMinSketch()
+
+def expire_failures(ip, cutoff):
+    failed_logins[ip] = [
+        t for t in failed_logins[ip] 
+        if (t.replace(tzinfo=timezone.utc) if t.tzinfo is None else t) > cutoff
+    ]
+    if not failed_logins[ip]:
+        del failed_logins[ip]
+
+def clean_old_data(now=None, ip=None):
+    """Expire failed logins older than TIME_WINDOW before `now`.
+
+    Only `ip`'s list affects the current event, so that one is always
+    trimmed; the sweep over every IP runs once per sub-window.
+    """
+    global last_sweep
+    now = now or datetime.now(timezone.utc)
+    cutoff = now - TIME_WINDOW
+    
+    if ip in failed_logins:
+        expire_failures(ip, cutoff)
+    
+    if last_sweep is None or not (now - TIME_WINDOW / SKETCH_BUCKETS < last_sweep <= now):
+        for ip in list(failed_logins.keys()):
+            expire_failures(ip, cutoff)
+        last_sweep = now
 
 def parse_timestamp(timestamp_str):
     if not timestamp_str:
@@ -44,78 +418,101 @@ def parse_timestamp(timestamp_str):
         except:
             return datetime.now(timezone.utc)
 
-@app.route('/analyze', methods=['POST'])
-def analyze():
+def process_event(log, now=None, keys=('ip', 'user')):
+    """Run one event through the detection rules and return the alerts.
+
+    `now` is the reference time for expiring old failures, and the latest
+    sub-window the sketches may advance to. Live traffic uses the wall
+    clock; replay passes the event time. `keys` picks the rules:
+    'ip' for the IP-keyed ones (brute force, compromise, spraying, heavy
+    hitter per IP), 'user' for the user-keyed ones. Sharded replay sends an
+    event to the IP's shard with ('ip',) and to the user's with ('user',).
+    """
     alerts = []
     
+    event_type = log.get('event')
+    ip = log.get('ip')
+    user = log.get('user')
+    timestamp = parse_timestamp(log.get('timestamp'))
+    now = now or datetime.now(timezone.utc)
+    
+    by_ip = 'ip' in keys and ip
+    if 'ip' in keys:
+        clean_old_data(now, ip)
+    
+    # Brute Force Detection
+    if event_type == 'login_failed' and by_ip:
+        failed_logins[ip].append(timestamp)
+        trace(f"[DETECT] Failed login from {ip}, total: {len(failed_logins[ip])}")
+        
+        if len(failed_logins[ip]) == BRUTE_FORCE_THRESHOLD:
+            alert = {
+                "alert_id": f"BF-{ip}-{int(timestamp.timestamp())}",
+                "alert_type": "BruteForceSuspected",
+                "confidence": 0.85,
+                "ip": ip,
+                "user": user or "unknown",
+                "failed_count": len(failed_logins[ip]),
+                "timestamp": timestamp.isoformat(),
+                "source": "detection-alert"
+            }
+            alerts.append(alert)
+            trace(f"🚨 ALERT: Brute force detected from {ip}")
+    
+    # Credential Compromise
+    elif event_type == 'login_success' and by_ip:
+        if ip in failed_logins and len(failed_logins[ip]) > 0:
+            alert = {
+                "alert_id": f"COMP-{ip}-{int(timestamp.timestamp())}",
+                "alert_type": "PossibleCredentialCompromise",
+                "confidence": 0.90,
+                "ip": ip,
+                "user": user or "unknown",
+                "timestamp": timestamp.isoformat(),
+                "source": "detection-alert"
+            }
+            alerts.append(alert)
+            trace(f"🚨 ALERT: Credential compromise - {user}@{ip}")
+    
+    # Password Spraying / Distributed Brute Force (fixed-memory sketches)
+    if event_type == 'login_failed':
+        sketch_alerts = []
+        if 'ip' in keys:
+            sketch_alerts += detect_ip_patterns(ip, user, timestamp, now)
+        if 'user' in keys:
+            sketch_alerts += detect_user_patterns(ip, user, timestamp, now)
+        for alert in sketch_alerts:
+            alerts.append(alert)
+            trace(f"🚨 ALERT: {alert['alert_type']} - {user}@{ip}")
+    
+    return alerts
+
+def handle_event(log):
+    """Detect on a live event (HTTP or ring) and queue its alerts for dispatch"""
+    trace(f"[ANALYZE] Event: {log.get('event')}, IP: {log.get('ip')}, User: {log.get('user')}")
+    
+    with detection_lock:
+        alerts = process_event(log)
+    for alert in alerts:
+        alert_queue.put(alert)
+    return alerts
+
+def dispatch_alerts():
+    """Background loop writing queued alerts to /logs and sending them to n8n"""
+    while True:
+        alert = alert_queue.get()
+        save_alert(alert)
+        send_to_n8n(alert)
+
+@app.route('/analyze', methods=['POST'])
+def analyze():
     try:
         log = request.get_json(force=True)
         
         if not log:
             return jsonify({"error": "No data"}), 400
         
-        event_type = log.get('event')
-        ip = log.get('ip')
-        user = log.get('user')
-        timestamp = parse_timestamp(log.get('timestamp'))
-        
-        print(f"[ANALYZE] Event: {event_type}, IP: {ip}, User: {user}")
-        
-        clean_old_data()
-        
-        # Brute Force Detection
-        if event_type == 'login_failed' and ip:
-            failed_logins[ip].append(timestamp)
-            print(f"[DETECT] Failed login from {ip}, total: {len(failed_logins[ip])}")
-            
-            if len(failed_logins[ip]) == BRUTE_FORCE_THRESHOLD:
-                alert = {
-                    "alert_id": f"BF-{ip}-{int(timestamp.timestamp())}",
-                    "alert_type": "BruteForceSuspected",
-                    "confidence": 0.85,
-                    "ip": ip,
-                    "user": user or "unknown",
-                    "failed_count": len(failed_logins[ip]),
-                    "timestamp": timestamp.isoformat(),
-                    "source": "detection-alert"
-                }
-                alerts.append(alert)
-                print(f"🚨 ALERT: Brute force detected from {ip}")
-                
-                try:
-                    os.makedirs('/logs', exist_ok=True)
-                    with open('/logs/unified.log', 'a') as f:
-                        f.write(json.dumps(alert) + '\n')
-                    print("[SAVED] Alert written to unified.log")
-                except Exception as e:
-                    print(f"[ERROR] Failed to save alert: {e}")
-                
-                send_to_n8n(alert)
-        
-        # Credential Compromise
-        elif event_type == 'login_success' and ip:
-            if ip in failed_logins and len(failed_logins[ip]) > 0:
-                alert = {
-                    "alert_id": f"COMP-{ip}-{int(timestamp.timestamp())}",
-                    "alert_type": "PossibleCredentialCompromise",
-                    "confidence": 0.90,
-                    "ip": ip,
-                    "user": user or "unknown",
-                    "timestamp": timestamp.isoformat(),
-                    "source": "detection-alert"
-                }
-                alerts.append(alert)
-                print(f"🚨 ALERT: Credential compromise - {user}@{ip}")
-                
-                try:
-                    os.makedirs('/logs', exist_ok=True)
-                    with open('/logs/unified.log', 'a') as f:
-                        f.write(json.dumps(alert) + '\n')
-                    print("[SAVED] Alert written to unified.log")
-                except Exception as e:
-                    print(f"[ERROR] Failed to save alert: {e}")
-                
-                send_to_n8n(alert)
+        alerts = handle_event(log)
         
         return jsonify({"status": "analyzed", "alerts": alerts}), 200
         
@@ -127,6 +524,15 @@ def analyze():
             mimetype='application/json'
         )
 
+def save_alert(alert):
+    try:
+        os.makedirs('/logs', exist_ok=True)
+        with open('/logs/unified.log', 'a') as f:
+            f.write(json.dumps(alert) + '\n')
+        print("[SAVED] Alert written to unified.log")
+    except Exception as e:
+        print(f"[ERROR] Failed to save alert: {e}")
+
 def send_to_n8n(alert):
     try:
         response = requests.post(
@@ -140,14 +546,148 @@ def send_to_n8n(alert):
     except Exception as e:
         print(f"❌ Failed to send to n8n: {e}")
 
+class EventRingReader:
+    """Consumer side of the shared-memory event ring written by the log collector.
+
+    Layout (shared with collector.py): a 128-byte header, then `capacity`
+    bytes of records. Header fields are little-endian u64: magic at 0,
+    capacity at 8, producer write position at 16 and next sequence number
+    at 24, HTTP fallback count at 32 (events the collector could not put in
+    the ring), consumer read position at 64 and heartbeat (ms) at 72.
+    Positions only grow; a record lives at position % capacity and is a
+    (u32 length, u64 sequence) header followed by the JSON payload. A
+    length of RING_WRAP, or too little room for a record header, means
+    the producer continued at the start of the buffer.
+
+    ring_lost in /health only counts sequence gaps, i.e. records overwritten
+    or corrupted while the ring was being read. How many records a reset or
+    replaced ring dropped cannot be known; those show up as ring_resets.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'r+b') as f:
+            self.inode = os.fstat(f.fileno()).st_ino
+            self.mm = mmap.mmap(f.fileno(), 0)
+        if self.mm[:8] != RING_MAGIC:
+            self.mm.close()
+            raise ValueError(f"{path} is not an initialised event ring")
+        self.capacity = struct.unpack_from('<Q', self.mm, 8)[0]
+        self.read_pos = self.pending_pos = struct.unpack_from('<Q', self.mm, 64)[0]
+        self.expected_seq = None
+
+    def heartbeat(self):
+        struct.pack_into('<Q', self.mm, 72, int(time.time() * 1000))
+
+    def fallbacks(self):
+        return struct.unpack_from('<Q', self.mm, 32)[0]
+
+    def replaced(self):
+        """True if the collector recreated the ring file under this mapping"""
+        try:
+            return os.stat(self.path).st_ino != self.inode
+        except FileNotFoundError:
+            return True
+
+    def read_batch(self, limit):
+        """Up to `limit` payloads after the read position (not yet committed)"""
+        write_pos = struct.unpack_from('<Q', self.mm, 16)[0]
+        if write_pos < self.read_pos:
+            print("[RING] Ring was reset by the producer, resyncing")
+            ring_stats["resets"] += 1
+            self.read_pos = write_pos
+            self.expected_seq = None
+
+        payloads = []
+        pos = self.read_pos
+        while pos < write_pos and len(payloads) < limit:
+            offset = pos % self.capacity
+            room = self.capacity - offset
+            if room < RECORD_HEADER.size:
+                pos += room
+                continue
+            length, seq = RECORD_HEADER.unpack_from(self.mm, RING_HEADER + offset)
+            if length == RING_WRAP:
+                pos += room
+                continue
+            start = RING_HEADER + offset + RECORD_HEADER.size
+            payloads.append(self.mm[start:start + length])
+            pos += RECORD_HEADER.size + length
+
+            if self.expected_seq is not None and seq != self.expected_seq:
+                ring_stats["lost"] += max(0, seq - self.expected_seq)
+                print(f"[RING] Sequence gap: expected {self.expected_seq}, got {seq}")
+            self.expected_seq = seq + 1
+        self.pending_pos = pos
+        return payloads
+
+    def commit(self):
+        """Release the last batch's space back to the producer"""
+        self.read_pos = self.pending_pos
+        struct.pack_into('<Q', self.mm, 64, self.read_pos)
+
+def consume_ring():
+    """Background loop feeding ring events to the detector in batches"""
+    global event_ring
+    last_check = time.monotonic()
+    while True:
+        try:
+            if event_ring is None:
+                event_ring = EventRingReader(EVENT_RING_PATH)
+                print(f"[RING] Consuming events from {EVENT_RING_PATH}")
+            event_ring.heartbeat()
+            payloads = event_ring.read_batch(RING_BATCH)
+            if not payloads:
+                if time.monotonic() - last_check > RING_CHECK_INTERVAL:
+                    last_check = time.monotonic()
+                    if event_ring.replaced():
+                        print("[RING] Ring file was replaced, reopening")
+                        ring_stats["resets"] += 1
+                        event_ring = None
+                        continue
+                time.sleep(RING_POLL_INTERVAL)
+                continue
+            for payload in payloads:
+                # Per event, so a slow batch never looks like a dead consumer
+                event_ring.heartbeat()
+                try:
+                    handle_event(json.loads(payload))
+                except Exception as e:
+                    print(f"❌ ERROR: {e}")
+            ring_stats["received"] += len(payloads)
+            event_ring.commit()
+        except (OSError, ValueError) as e:
+            # Segment not there yet (collector not started): retry, HTTP still works
+            if event_ring is None:
+                time.sleep(1)
+            else:
+                print(f"[RING] Error reading ring: {e}")
+                event_ring = None
+
 @app.route('/health', methods=['GET'])
 def health():
+    ring = event_ring  # consume_ring may drop the reader at any moment
+    with detection_lock:
+        # Sizing the sketches iterates them; don't race the detection threads
+        tracked_ips, tracked_users = len(users_per_ip), len(ips_per_user)
+        memory_bytes = sketch_memory_bytes()
     return jsonify({
         "status": "healthy",
         "service": "detection-engine",
-        "active_ips": len(failed_logins)
+        "active_ips": len(failed_logins),
+        "sketch_tracked_ips": tracked_ips,
+        "sketch_tracked_users": tracked_users,
+        "sketch_memory_bytes": memory_bytes,
+        "alert_queue": alert_queue.qsize(),
+        "ring_received": ring_stats["received"],
+        "ring_lost": ring_stats["lost"],
+        "ring_resets": ring_stats["resets"],
+        "ring_fallbacks": ring.fallbacks() if ring else 0
     }), 200
 
 if __name__ == '__main__':
+    threading.Thread(target=dispatch_alerts, daemon=True).start()
+    if EVENT_RING_PATH:
+        threading.Thread(target=consume_ring, daemon=True).start()
     print("🔍 Detection Engine starting on port 5001...")
     app.run(host='0.0.0.0', port=5001)
@@ -0,0 +1,249 @@
+"""Offline replay / backtesting for the detection engine.
+
+Streams historical unified.log files (plain or .gz archives) through the
+same detection logic as /analyze, in event-time order and without HTTP,
+n8n or writes to /logs. The logs are parsed once, in this process; with
+--workers N each event goes to the worker owning its IP (IP-keyed rules)
+and to the worker owning its user (user-keyed rules), so every rule runs
+once per event.
+
+    python replay.py /logs/unified.log* --threshold 5 --window 10 --workers 4
+
+Prints the per-rule alert counts, a diff against the alerts recorded in
+the same logs and the replay throughput.
+"""
+from collections import Counter
+from datetime import timedelta
+import argparse
+import gzip
+import heapq
+import json
+import multiprocessing
+import queue
+import time
+import zlib
+
+import detector
+
+REORDER_BUFFER = 10000  # events held per file to fix small timestamp disorder
+CHUNK_SIZE = 1000       # events per message to a worker
+WORKER_POLL = 1.0       # seconds between worker liveness checks while waiting
+
+
+def read_log(path):
+    """Yield JSON objects from one plain or gzipped log, skipping bad lines"""
+    opener = gzip.open if path.endswith('.gz') else open
+    try:
+        with opener(path, 'rt', errors='replace') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(record, dict):
+                    yield record
+    except (OSError, EOFError, zlib.error) as e:
+        print(f"⚠️  Stopped reading {path}: {e}")
+
+def is_alert(record):
+    return record.get('source') == 'detection-alert' or 'alert_type' in record
+
+def in_time_order(records):
+    """(timestamp, n, record) in event-time order, using a bounded reorder buffer"""
+    buffer = []
+    for n, record in enumerate(records):
+        heapq.heappush(buffer, (detector.parse_timestamp(record.get('timestamp')), n, record))
+        if len(buffer) > REORDER_BUFFER:
+            yield heapq.heappop(buffer)
+    while buffer:
+        yield heapq.heappop(buffer)
+
+def stream_events(paths, recorded):
+    """Merge the logs into one event-time ordered stream of (timestamp, event).
+
+    Alerts met on the way are collected into `recorded` (alert_id -> alert).
+    """
+    merged = heapq.merge(*(in_time_order(read_log(path)) for path in paths), key=lambda e: e[0])
+    for timestamp, _, record in merged:
+        if is_alert(record):
+            if 'alert_id' in record:
+                recorded[record['alert_id']] = record
+            continue
+        yield timestamp, record
+
+def start_detector(settings):
+    """Fresh, quiet detector state with the CLI overrides applied"""
+    for name, value in settings.items():
+        setattr(detector, name, value)
+    detector.VERBOSE = False
+    detector.reset_state()
+
+def detect(event, timestamp, keys=('ip', 'user')):
+    """Alerts for one event, or None if the detector can't handle it"""
+    try:
+        return detector.process_event(event, now=timestamp, keys=keys)
+    except Exception:
+        return None
+
+def replay_worker(inbox, results, settings):
+    """Worker process: run (n, timestamp, event, keys) chunks until None"""
+    start_detector(settings)
+    alerts = []
+    skipped = set()
+    for chunk in iter(inbox.get, None):
+        for n, timestamp, event, keys in chunk:
+            found = detect(event, timestamp, keys)
+            if found is None:
+                skipped.add(n)
+            else:
+                alerts.extend(found)
+    results.put((alerts, skipped))
+
+def check_workers(procs, inboxes):
+    """Stop the replay if a worker died instead of waiting on it forever"""
+    for proc in procs:
+        if proc.exitcode not in (None, 0):
+            for other, inbox in zip(procs, inboxes):
+                other.terminate()
+                inbox.cancel_join_thread()  # don't block exit flushing to a dead reader
+            raise SystemExit(f"❌ Replay worker {proc.name} died (exit code {proc.exitcode})")
+
+def replay_sharded(events, workers, settings):
+    """Hand events to `workers` processes by hash of IP and of user"""
+    ctx = multiprocessing.get_context()
+    results = ctx.Queue()
+    inboxes = [ctx.Queue(maxsize=64) for _ in range(workers)]
+    procs = [ctx.Process(target=replay_worker, args=(inbox, results, settings)) for inbox in inboxes]
+    for proc in procs:
+        proc.start()
+
+    def put(shard, item):
+        while True:
+            try:
+                inboxes[shard].put(item, timeout=WORKER_POLL)
+                return
+            except queue.Full:
+                check_workers(procs, inboxes)
+
+    chunks = [[] for _ in range(workers)]
+
+    def send(shard, item):
+        chunks[shard].append(item)
+        if len(chunks[shard]) >= CHUNK_SIZE:
+            put(shard, chunks[shard])
+            chunks[shard] = []
+
+    count = 0
+    for timestamp, event in events:
+        count += 1
+        ip_shard = detector.hash64(event.get('ip')) % workers
+        user_shard = detector.hash64(event.get('user')) % workers
+        if ip_shard == user_shard:
+            send(ip_shard, (count, timestamp, event, ('ip', 'user')))
+        else:
+            send(ip_shard, (count, timestamp, event, ('ip',)))
+            send(user_shard, (count, timestamp, event, ('user',)))
+
+    for shard in range(workers):
+        if chunks[shard]:
+            put(shard, chunks[shard])
+        put(shard, None)
+
+    alerts, skipped = [], set()
+    for _ in procs:
+        while True:
+            try:
+                worker_alerts, worker_skipped = results.get(timeout=WORKER_POLL)
+                break
+            except queue.Empty:
+                check_workers(procs, inboxes)
+        alerts.extend(worker_alerts)
+        skipped |= worker_skipped
+    for proc in procs:
+        proc.join()
+    return alerts, count, len(skipped)
+
+def replay(events, settings):
+    start_detector(settings)
+    alerts = []
+    count = skipped = 0
+    for timestamp, event in events:
+        count += 1
+        found = detect(event, timestamp)
+        if found is None:
+            skipped += 1
+        else:
+            alerts.extend(found)
+    return alerts, count, skipped
+
+def diff_alerts(replayed, recorded):
+    replayed_ids = {a['alert_id'] for a in replayed}
+    return {
+        'matched': sorted(replayed_ids & recorded.keys()),
+        'new': sorted(replayed_ids - recorded.keys()),
+        'missing': sorted(recorded.keys() - replayed_ids),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('logs', nargs='+', help='unified.log files (.gz allowed)')
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--threshold', type=int, help='BRUTE_FORCE_THRESHOLD')
+    parser.add_argument('--window', type=float, help='TIME_WINDOW in minutes')
+    parser.add_argument('--spray-threshold', type=int, help='SPRAY_USER_THRESHOLD')
+    parser.add_argument('--distributed-threshold', type=int, help='DISTRIBUTED_IP_THRESHOLD')
+    parser.add_argument('--heavy-hitter-threshold', type=int, help='HEAVY_HITTER_THRESHOLD')
+    parser.add_argument('--output', help='write replayed alerts to this file (JSON lines)')
+    parser.add_argument('--show', type=int, default=10, help='alert ids listed per diff section')
+    args = parser.parse_args()
+
+    settings = {}
+    if args.threshold is not None:
+        settings['BRUTE_FORCE_THRESHOLD'] = args.threshold
+    if args.window is not None:
+        settings['TIME_WINDOW'] = timedelta(minutes=args.window)
+    if args.spray_threshold is not None:
+        settings['SPRAY_USER_THRESHOLD'] = args.spray_threshold
+    if args.distributed_threshold is not None:
+        settings['DISTRIBUTED_IP_THRESHOLD'] = args.distributed_threshold
+    if args.heavy_hitter_threshold is not None:
+        settings['HEAVY_HITTER_THRESHOLD'] = args.heavy_hitter_threshold
+
+    started = time.perf_counter()
+    recorded = {}
+    events = stream_events(args.logs, recorded)
+    if args.workers > 1:
+        alerts, event_count, skipped = replay_sharded(events, args.workers, settings)
+    else:
+        alerts, event_count, skipped = replay(events, settings)
+    elapsed = time.perf_counter() - started
+    alerts.sort(key=lambda a: (a['timestamp'], a['alert_id']))
+    diff = diff_alerts(alerts, recorded)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            for alert in alerts:
+                f.write(json.dumps(alert) + '\n')
+
+    replayed_by_rule = Counter(a['alert_type'] for a in alerts)
+    recorded_by_rule = Counter(a['alert_type'] for a in recorded.values())
+    matched = set(diff['matched'])
+    matched_by_rule = Counter(a['alert_type'] for a in alerts if a['alert_id'] in matched)
+
+    print(f"📼 Replayed {event_count} events in {elapsed:.2f}s "
+          f"({event_count / elapsed if elapsed else 0:.0f} events/s, {args.workers} worker(s))")
+    if skipped:
+        print(f"⚠️  Skipped {skipped} event(s) the detector could not process")
+    print()
+    print(f"{'rule':<32} {'replayed':>9} {'recorded':>9} {'matched':>8}")
+    for rule in sorted(replayed_by_rule.keys() | recorded_by_rule.keys()):
+        print(f"{rule:<32} {replayed_by_rule[rule]:>9} {recorded_by_rule[rule]:>9} {matched_by_rule[rule]:>8}")
+    print()
+    print(f"matched: {len(diff['matched'])}, new: {len(diff['new'])}, missing: {len(diff['missing'])}")
+    for section in ('new', 'missing'):
+        for alert_id in diff[section][:args.show]:
+            print(f"  {'+' if section == 'new' else '-'} {alert_id}")
+
+
+if __name__ == '__main__':
+    main()
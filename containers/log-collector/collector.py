@@ -1,6 +1,11 @@
 from flask import Flask, request, jsonify
+import fcntl
 import json
+import mmap
 import os
+import struct
+import threading
+import time
 from datetime import datetime
 import requests
 
@@ -8,8 +13,99 @@ app = Flask(__name__)
 LOG_DIR = "/logs"
 UNIFIED_LOG = f"{LOG_DIR}/unified.log"
 
+# Optional shared-memory transport to a co-located detection engine
+EVENT_RING_PATH = os.environ.get('EVENT_RING_PATH')
+EVENT_RING_SIZE = int(os.environ.get('EVENT_RING_SIZE', str(8 * 1024 * 1024)))
+RING_CONSUMER_TIMEOUT = 5  # seconds without a detector heartbeat before using HTTP
+RING_MAGIC = b'SOCRING1'
+RING_HEADER = 128
+RING_WRAP = 0xFFFFFFFF
+RECORD_HEADER = struct.Struct('<IQ')  # payload length, sequence number
+
 os.makedirs(LOG_DIR, exist_ok=True)
 
+class EventRingWriter:
+    """Producer side of the shared-memory event ring read by the detection engine.
+
+    Layout (shared with detector.py): a 128-byte header, then `capacity`
+    bytes of records. Header fields are little-endian u64: magic at 0,
+    capacity at 8, producer write position at 16 and next sequence number
+    at 24, HTTP fallback count at 32, consumer read position at 64 and
+    heartbeat (ms) at 72.
+    Writers are serialised with flock, so several collector processes can
+    share one ring.
+    """
+
+    def __init__(self, path, size):
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o666)
+        self.lock = threading.Lock()
+        fcntl.flock(self.fd, fcntl.LOCK_EX)
+        try:
+            header = os.pread(self.fd, RING_HEADER, 0)
+            if len(header) < RING_HEADER or header[:8] != RING_MAGIC:
+                os.ftruncate(self.fd, 0)
+                os.ftruncate(self.fd, RING_HEADER + size)
+                os.pwrite(self.fd, struct.pack('<Q', size), 8)
+                os.pwrite(self.fd, RING_MAGIC, 0)
+        finally:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+        self.mm = mmap.mmap(self.fd, 0)
+        self.capacity = struct.unpack_from('<Q', self.mm, 8)[0]
+
+    def consumer_alive(self):
+        heartbeat = struct.unpack_from('<Q', self.mm, 72)[0]
+        return time.time() * 1000 - heartbeat < RING_CONSUMER_TIMEOUT * 1000
+
+    def publish(self, payload):
+        """Append one record; False if it must go over HTTP instead"""
+        with self.lock:
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+            try:
+                if self.consumer_alive() and self.append(payload):
+                    return True
+                # Shown as ring_fallbacks in the detector's /health
+                fallbacks = struct.unpack_from('<Q', self.mm, 32)[0]
+                struct.pack_into('<Q', self.mm, 32, fallbacks + 1)
+                return False
+            finally:
+                fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+    def append(self, payload):
+        """Write one record under the lock; False if the ring is full"""
+        write_pos, seq = struct.unpack_from('<QQ', self.mm, 16)
+        read_pos = struct.unpack_from('<Q', self.mm, 64)[0]
+        offset = write_pos % self.capacity
+        room = self.capacity - offset
+        size = RECORD_HEADER.size + len(payload)
+        skip = room if room < size else 0
+        if skip + size > self.capacity - (write_pos - read_pos):
+            return False  # ring full (or record too large)
+
+        if skip:
+            if room >= RECORD_HEADER.size:
+                RECORD_HEADER.pack_into(self.mm, RING_HEADER + offset, RING_WRAP, 0)
+            write_pos += skip
+            offset = 0
+        start = RING_HEADER + offset
+        RECORD_HEADER.pack_into(self.mm, start, len(payload), seq)
+        self.mm[start + RECORD_HEADER.size:start + size] = payload
+        # Publish the position only after the record bytes are in place
+        struct.pack_into('<QQ', self.mm, 16, write_pos + size, seq + 1)
+        return True
+
+def open_event_ring():
+    if not EVENT_RING_PATH:
+        return None
+    try:
+        ring = EventRingWriter(EVENT_RING_PATH, EVENT_RING_SIZE)
+        print(f"🔗 Event ring at {EVENT_RING_PATH} ({ring.capacity} bytes)")
+        return ring
+    except Exception as e:
+        print(f"⚠️  Event ring unavailable, using HTTP: {e}")
+        return None
+
+event_ring = open_event_ring()
+
 @app.route('/ingest', methods=['POST'])
 def ingest_log():
     try:
@@ -23,14 +119,16 @@ def ingest_log():
             "ip": data.get("ip"),
             "details": data.get("details", {})
         }
+        line = json.dumps(unified_log)
         
         with open(UNIFIED_LOG, 'a') as f:
-            f.write(json.dumps(unified_log) + '\n')
+            f.write(line + '\n')
         
-        try:
-            requests.post('http://soc-detection:5001/analyze', json=unified_log, timeout=2)
-        except:
-            pass
+        if not (event_ring and event_ring.publish(line.encode())):
+            try:
+                requests.post('http://soc-detection:5001/analyze', json=unified_log, timeout=2)
+            except:
+                pass
         
         return jsonify({"status": "ingested"}), 200
         